@@ -1,9 +1,17 @@
 import os
+import sys
 import asyncio
 import logging
-from typing import Optional, Dict, List
+from typing import Annotated, Any, Optional, Dict, List, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import re
+import functools
+import hashlib
+import time
+from uuid import uuid4
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from agno.agent import Agent
@@ -12,11 +20,27 @@ from agno.os import AgentOS
 from fastapi.middleware.cors import CORSMiddleware
 from agno.db.postgres import PostgresDb
 from agno.knowledge.knowledge import Knowledge
-from agno.vectordb.pgvector import PgVector
+from agno.knowledge.content import Content, ContentStatus
+from agno.db.schemas.knowledge import KnowledgeRow
+from agno.vectordb.pgvector import PgVector, HNSW, Distance, SearchType
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from agno.run.agent import RunEvent
+from pydantic import BaseModel, Field, field_validator
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 from agno.tools.reasoning import ReasoningTools
+from agno.session import SessionSummaryManager
 from agno.knowledge.embedder.openai import OpenAIEmbedder
-from agno.tools.postgres import PostgresTools
+from agno.tools import Toolkit
+from cachetools import TTLCache
+import httpx
+import asyncpg
+from sqlalchemy import Column, Table, create_engine, make_url, text
+from sqlalchemy.exc import ArgumentError
+from pgvector.sqlalchemy import HALFVEC
+from pgvector.asyncpg import register_vector
+
+from swim_standards import AGE_GROUPS, parse_usa_standards, seconds_to_time, time_to_seconds
 
 # ------------------------------------------------------------
 # 1. Logging Setup
@@ -26,40 +50,279 @@ logger = logging.getLogger(__name__)
 
 # ------------------------------------------------------------
 # 2. Environment Variables (Loaded from .env)
-# Loads environments variables and keys.
+# Loads environments variables and keys into a validated Settings object.
 # ------------------------------------------------------------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-DATABASE_CONNECTION_STRING = os.getenv("DATABASE_CONNECTION_STRING")
-DATABASE_HOST = os.getenv("DATABASE_HOST")
-DATABASE_PORT = os.getenv("DATABASE_PORT")
-DATABASE_NAME = os.getenv("DATABASE_NAME")
-DATABASE_USER = os.getenv("DATABASE_USER")
-DATABASE_PASSWORD = os.getenv("DATABASE_PASSWORD")
-ENV = os.getenv("ENV", "development")
+class Settings(BaseSettings):
+    """Validated app configuration, read from the environment and .env."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    openai_api_key: str = Field(min_length=1)
+    database_connection_string: str
+    env: str = "development"
+    # Comma-separated list of frontend origins allowed to call the API in production
+    cors_origins: Annotated[List[str], NoDecode] = ["https://ai-agent-ui-w35p.onrender.com"]
+    port: int = 8000
+    web_concurrency: Optional[int] = None
+    # Postgres connections the app may hold open in total, across all workers and both pools.
+    # Keep it under the server's max_connections (100 by default, or the pgbouncer pool size).
+    db_max_connections: int = 80
+
+    @field_validator("database_connection_string")
+    @classmethod
+    def check_database_url(cls, value: str) -> str:
+        # Fail at startup rather than on the first query
+        try:
+            make_url(value)
+        except ArgumentError as e:
+            raise ValueError(f"invalid database URL: {e}") from e
+        return value
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not set in .env")
+    @field_validator("cors_origins", mode="before")
+    @classmethod
+    def split_cors_origins(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return [origin.strip() for origin in value.split(",") if origin.strip()]
+        return value
 
-DB_URL = DATABASE_CONNECTION_STRING
+    @property
+    def workers(self) -> int:
+        """
+        Worker processes sharing DB_MAX_CONNECTIONS. uvicorn and gunicorn both default to
+        WEB_CONCURRENCY workers (1 when unset), and `python main.py` exports the count it starts.
+        A launcher given its own count (e.g. gunicorn -w) needs WEB_CONCURRENCY set to match.
+        """
+        if self.env == "development":
+            return 1  # reload runs a single process
+        return self.web_concurrency or 1
+
+@functools.lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+# agno's OpenAI clients read OPENAI_API_KEY from the process environment, not from Settings
+load_dotenv()
+settings = get_settings()
 
 # ------------------------------------------------------------
 # 3. Database + VectorDB Setup
 # Initializes PostgresDb(for structured data) and PgVector(for knowledge base)
+# Both share one SQLAlchemy engine (and its connection pool); async code shares one asyncpg pool.
 # ------------------------------------------------------------
+# Every worker process opens both pools, so each gets an equal share of DB_MAX_CONNECTIONS.
+# The SQLAlchemy engine serves most of each request (agno sessions, knowledge search, semantic
+# cache) and gets three quarters; asyncpg (standards lookups, SQL tools, loads) the rest.
+# At least 2 asyncpg connections: the (single) knowledge load of a worker holds one for its
+# advisory lock while using another.
+DB_CONNECTIONS_PER_WORKER = max(6, settings.db_max_connections // settings.workers)
+ASYNCPG_POOL_SIZE = max(2, DB_CONNECTIONS_PER_WORKER // 4)
+SQLALCHEMY_POOL_SIZE = DB_CONNECTIONS_PER_WORKER - ASYNCPG_POOL_SIZE
+
+if DB_CONNECTIONS_PER_WORKER * settings.workers > settings.db_max_connections:
+    logger.warning(
+        f"DB_MAX_CONNECTIONS={settings.db_max_connections} is too low for {settings.workers} workers, "
+        f"using {DB_CONNECTIONS_PER_WORKER} connections per worker"
+    )
+
+db_engine = create_engine(
+    settings.database_connection_string,
+    pool_size=SQLALCHEMY_POOL_SIZE,
+    max_overflow=0,                 # never exceed the worker's share
+    pool_pre_ping=True,             # drop connections the server (or pgbouncer) closed
+)
+
+pg_pool: Optional[asyncpg.Pool] = None
+pg_pool_lock = asyncio.Lock()
+
+async def init_pg_connection(conn) -> None:
+    """Registers the binary (half)vec codecs once per pooled connection (COPY of cached chunks needs them)."""
+    # PgVector creates the extension too, but the pool can be opened first on a fresh database
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await register_vector(conn)
+
+async def get_pg_pool() -> asyncpg.Pool:
+    """Returns the shared asyncpg pool, creating it on first use (it needs a running event loop)."""
+    global pg_pool
+    async with pg_pool_lock:
+        if pg_pool is None:
+            pg_pool = await asyncpg.create_pool(
+                # asyncpg only understands plain postgresql:// URLs, not SQLAlchemy driver suffixes
+                make_url(settings.database_connection_string).set(drivername="postgresql").render_as_string(hide_password=False),
+                min_size=1,                 # idle workers hold a single connection
+                max_size=ASYNCPG_POOL_SIZE,
+                statement_cache_size=1024,
+                init=init_pg_connection,
+            )
+    return pg_pool
 
 # PostgreSQL database for structured data (swim standards, analyses, etc.)
 db = PostgresDb(
-    db_url=DB_URL,
+    db_engine=db_engine,
     id="swimbench-db",
     knowledge_table="knowledge_contents",
 )
 
+HNSW_INDEX_NAME = "vectors_embedding_hnsw"
+
+def configure_hnsw_params(vector_count: int) -> HNSW:
+    """
+    Picks HNSW build/search parameters for the current knowledge base size.
+    Larger graphs need a higher m/ef_construction to keep recall, and a higher
+    ef_search to keep it at query time.
+    """
+    if vector_count < 100_000:
+        m, ef_construction, ef_search = 16, 64, 40
+    elif vector_count < 1_000_000:
+        m, ef_construction, ef_search = 24, 100, 100
+    else:
+        m, ef_construction, ef_search = 32, 128, 200
+
+    return HNSW(
+        name=HNSW_INDEX_NAME,
+        m=m,
+        ef_construction=ef_construction,
+        ef_search=ef_search,        # applied per query via SET LOCAL hnsw.ef_search
+        configuration={             # session settings used while (re)building the index
+            "maintenance_work_mem": "2GB",
+            "max_parallel_maintenance_workers": 7,
+        },
+    )
+
+@dataclass
+class SwimBenchEmbedder(OpenAIEmbedder):
+    """
+    OpenAIEmbedder with batched, bounded requests.
+    PgVector embeds each chunk of a batch with an unbounded asyncio.gather, so a
+    large PDF fires one request per chunk. Concurrent per-chunk calls are instead
+    coalesced into the native `input=[...]` endpoint, in sub-batches of batch_size.
+    """
+
+    max_concurrency: int = 16
+    batch_size: int = 100           # texts per embeddings request: one request per PgVector insert batch of 100
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+    _pending: List[Tuple[str, asyncio.Future]] = field(init=False, repr=False, default_factory=list)
+    _flush_task: Optional[asyncio.Task] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _request_params(self, input: Any) -> Dict[str, Any]:
+        req: Dict[str, Any] = {
+            "input": input,
+            "model": self.id,
+            "encoding_format": self.encoding_format,
+        }
+        if self.user is not None:
+            req["user"] = self.user
+        if self.id.startswith("text-embedding-3"):
+            req["dimensions"] = self.dimensions
+        if self.request_params:
+            req.update(self.request_params)
+        return req
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        async with self._semaphore:
+            return await super().async_get_embedding(text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[Optional[List[float]], Optional[Dict]]:
+        """
+        Queues the text for the next batched request instead of embedding it on its own.
+        Usage is only reported per request, so per-text usage is None. A text that fails to
+        embed gets None, which PgVector stores as a NULL embedding.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_pending())
+        return await future, None
+
+    async def _flush_pending(self) -> None:
+        # Texts queued while a request is in flight are sent by the next round of the loop
+        while self._pending:
+            # Yield once so every chunk gathered alongside the first one is queued
+            await asyncio.sleep(0)
+            batch, self._pending = self._pending, []
+            try:
+                embeddings = await self.async_get_embeddings_batch([text for text, _ in batch], self.batch_size)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    async def _async_embed_text(self, text: str) -> Optional[List[float]]:
+        async with self._semaphore:
+            try:
+                response = await self.aclient.embeddings.create(**self._request_params(text))
+                return response.data[0].embedding
+            except Exception as e:
+                logger.warning(f"Error in async embedding: {str(e)}")
+                return None
+
+    async def _async_embed_bucket(self, texts: List[str]) -> List[Optional[List[float]]]:
+        async with self._semaphore:
+            try:
+                response = await self.aclient.embeddings.create(**self._request_params(texts))
+                return [data.embedding for data in response.data]
+            except Exception as e:
+                logger.warning(f"Error in async batch embedding: {str(e)}")
+        # Fallback to individual calls for this bucket (outside the semaphore, they acquire it themselves)
+        return list(await asyncio.gather(*(self._async_embed_text(text) for text in texts)))
+
+    async def async_get_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[Optional[List[float]]]:
+        """
+        Embeds texts in buckets of batch_size, issued concurrently (bounded by max_concurrency).
+        Texts are sorted by length first so each bucket holds similarly sized inputs;
+        results are returned in the original order, with None for texts that failed to embed.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        buckets = [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+        bucket_embeddings = await asyncio.gather(
+            *(self._async_embed_bucket([texts[i] for i in bucket]) for bucket in buckets)
+        )
+
+        embeddings: List[Optional[List[float]]] = [None for _ in texts]
+        for bucket, vectors in zip(buckets, bucket_embeddings):
+            for i, vector in zip(bucket, vectors):
+                embeddings[i] = vector
+        return embeddings
+
+class HalfVecPgVector(PgVector):
+    """
+    PgVector storing embeddings as halfvec (FP16) instead of vector (FP32).
+    Halves the bytes read per distance computation; OpenAI's float32 output is
+    downcast by Postgres on insert.
+    """
+
+    def get_table_v1(self) -> Table:
+        super().get_table_v1()
+        # extend_existing=True swaps the embedding column type in place
+        return Table(
+            self.table_name,
+            self.metadata,
+            Column("embedding", HALFVEC(self.dimensions)),
+            extend_existing=True,
+        )
+
+    def _create_hnsw_index(self, sess, table_fullname: str, index_distance: str) -> None:
+        # vector_cosine_ops -> halfvec_cosine_ops (same for l2/ip)
+        super()._create_hnsw_index(sess, table_fullname, index_distance.replace("vector_", "halfvec_", 1))
+
 # pgvector database for embeddings and semantic search
-vector_db = PgVector(
+# HNSW index on the embedding column so retrieval uses ANN instead of a Seq Scan.
+# Distance and opclass must match (cosine <-> halfvec_cosine_ops) or the planner skips the index.
+vector_db = HalfVecPgVector(
     table_name="vectors", 
-    db_url=DB_URL,
-    embedder=OpenAIEmbedder(),
+    db_engine=db_engine,
+    embedder=SwimBenchEmbedder(),
+    search_type=SearchType.vector,
+    distance=Distance.cosine,
+    vector_index=configure_hnsw_params(0), # re-tuned from the row count at startup
 )
 
 # Knowledge wrapper (structured + vector db combined)
@@ -72,136 +335,530 @@ knowledge = Knowledge(
 
 # ------------------------------------------------------------
 # 4. Tools for Querying Postgres
-# Sets up PostgresTools and ReasoningTools so the agent can safely query DB and compute logic.
+# Sets up AsyncPostgresTools and ReasoningTools so the agent can safely query DB and compute logic.
 # ------------------------------------------------------------
-postgres_tools = PostgresTools(
-    host=DATABASE_HOST,
-    port=DATABASE_PORT,
-    db_name=DATABASE_NAME,
-    user=DATABASE_USER,
-    password=DATABASE_PASSWORD,
+class AsyncPostgresTools(Toolkit):
+    """
+    Read-only Postgres tools running on the shared asyncpg pool.
+    agno's PostgresTools runs psycopg calls on one shared sync connection, which
+    blocks the event loop for every query the agent makes.
+    """
+
+    def __init__(self, table_schema: str = "public"):
+        self.table_schema = table_schema
+        super().__init__(
+            name="postgres_tools",
+            tools=[self.show_tables, self.describe_table, self.inspect_query, self.run_query],
+        )
+
+    async def _execute_query(self, query: str, *args) -> str:
+        try:
+            pool = await get_pg_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction(readonly=True):
+                    # SET LOCAL so the search_path doesn't leak to other users of the pool
+                    await conn.execute(f"SET LOCAL search_path TO {self.table_schema}")
+                    rows = await conn.fetch(query, *args)
+        except Exception as e:
+            logger.error(f"Database error: {str(e)}")
+            return f"Error executing query: {e}"
+
+        if not rows:
+            return "Query returned no results."
+        header = ",".join(rows[0].keys())
+        data_rows = [",".join(map(str, row.values())) for row in rows]
+        return f"{header}\n" + "\n".join(data_rows)
+
+    async def show_tables(self) -> str:
+        """Lists all tables in the configured schema."""
+        return await self._execute_query(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = $1", self.table_schema
+        )
+
+    async def describe_table(self, table: str) -> str:
+        """
+        Provides the schema (column name, data type, is nullable) for a given table.
+
+        Args:
+            table: The name of the table to describe.
+
+        Returns:
+            A string describing the table's columns and data types.
+        """
+        return await self._execute_query(
+            "SELECT column_name, data_type, is_nullable FROM information_schema.columns "
+            "WHERE table_schema = $1 AND table_name = $2",
+            self.table_schema,
+            table,
+        )
+
+    async def inspect_query(self, query: str) -> str:
+        """
+        Shows the execution plan for a SQL query (using EXPLAIN).
+
+        Args:
+            query: The SQL query to inspect.
+
+        Returns:
+            The query's execution plan.
+        """
+        return await self._execute_query(f"EXPLAIN {query}")
+
+    async def run_query(self, query: str) -> str:
+        """
+        Runs a read-only SQL query and returns the result.
+
+        Args:
+            query: The SQL query to run.
+
+        Returns:
+            The query result as a formatted string.
+        """
+        return await self._execute_query(query)
+
+postgres_tools = AsyncPostgresTools(
     table_schema="ai", # all project tables live under schema "ai"
 )
 
+@functools.lru_cache(maxsize=64)
+def age_to_group(age: int) -> str:
+    """Maps a swimmer's age to its USA Swimming age group."""
+    if age <= 10:
+        return "10-under"
+    if age >= 17:
+        return "17-18"
+    low = age if age % 2 == 1 else age - 1
+    return f"{low}-{low + 1}"
+
+class SwimBenchTools(Toolkit):
+    """
+    Deterministic benchmarking against ai.usa_swimming_standards.
+    The same (event, age, gender, course, time) comes up again and again within a
+    session, so results are kept in a per-process TTL cache keyed on the time in centiseconds.
+    The key also holds the version of the last /loadknowledge (ai.knowledge_loads.loaded_at),
+    re-read at most every version_ttl seconds, so a load on any worker retires every worker's
+    cached results within that time.
+    """
+
+    def __init__(self, maxsize: int = 8192, ttl: int = 3600, version_ttl: int = 30):
+        self._benchmarks: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._version_ttl = version_ttl
+        self._load_version: Optional[datetime] = None
+        self._version_read_at: Optional[float] = None
+        super().__init__(name="swimbench_tools", tools=[self.benchmark_time])
+
+    def clear_cache(self) -> None:
+        self._benchmarks.clear()
+        self._version_read_at = None  # re-read the version on the next call
+
+    async def _get_load_version(self) -> Optional[datetime]:
+        now = time.monotonic()
+        if self._version_read_at is None or now - self._version_read_at >= self._version_ttl:
+            pool = await get_pg_pool()
+            try:
+                self._load_version = await pool.fetchval("SELECT max(loaded_at) FROM ai.knowledge_loads")
+            except asyncpg.UndefinedTableError:  # nothing loaded yet
+                self._load_version = None
+            self._version_read_at = now
+        return self._load_version
+
+    async def _get_benchmark(self, event: str, age_group: str, gender: str, course: str, time_centis: int) -> Dict:
+        version = await self._get_load_version()
+        key = (version, event, age_group, gender, course, time_centis)
+        if key in self._benchmarks:
+            return self._benchmarks[key]
+
+        pool = await get_pg_pool()
+        rows = await pool.fetch(
+            "SELECT standard_level, cutoff_time FROM ai.usa_swimming_standards "
+            "WHERE event = $1 AND age_group = $2 AND gender = $3 AND course = $4 "
+            "ORDER BY cutoff_time DESC",
+            event, age_group, gender, course,
+        )
+        seconds = time_centis / 100
+        achieved = [row for row in rows if seconds <= float(row["cutoff_time"])]
+        remaining = [row for row in rows if seconds > float(row["cutoff_time"])]
+
+        benchmark = {
+            "event": event,
+            "age_group": age_group,
+            "gender": gender,
+            "course": course,
+            "time_seconds": seconds,
+            "standard_achieved": achieved[-1]["standard_level"] if achieved else None,
+            "next_standard": remaining[0]["standard_level"] if remaining else None,
+            "next_standard_time": float(remaining[0]["cutoff_time"]) if remaining else None,
+            "time_drop_needed": round(seconds - float(remaining[0]["cutoff_time"]), 2) if remaining else 0.0,
+            "standards": {row["standard_level"]: float(row["cutoff_time"]) for row in rows},
+        }
+        # Without a recorded load (no source had an ETag/Last-Modified) a reload can't be told apart
+        if rows and version is not None:
+            self._benchmarks[key] = benchmark
+        return benchmark
+
+    async def benchmark_time(self, event: str, age: int, time: str, gender: str = "M", course: str = "SCY") -> str:
+        """
+        Benchmarks a swim time against the USA Swimming motivational standards.
+
+        Args:
+            event: Event key, e.g. '100_freestyle', '200_im'.
+            age: Swimmer's age.
+            time: Swim time as MM:SS.SS or SS.SS.
+            gender: 'M' or 'F'.
+            course: 'SCY', 'SCM' or 'LCM'.
+
+        Returns:
+            JSON with the standard achieved, the next standard, its cutoff and the time drop needed.
+        """
+        try:
+            time_centis = round(time_to_seconds(time) * 100)
+            benchmark = await self._get_benchmark(
+                event.lower(), age_to_group(age), gender.upper(), course.upper(), time_centis
+            )
+        except Exception as e:
+            logger.error(f"Error benchmarking time: {str(e)}")
+            return f"Error benchmarking time: {e}"
+
+        if not benchmark["standards"]:
+            return f"No standards found for {event} ({benchmark['age_group']}, {gender}, {course})."
+        return json.dumps(benchmark)
+
+swimbench_tools = SwimBenchTools()
+
 # ------------------------------------------------------------
 # 5. SwimBench Agent Configuration
 # Creates the Agent with a carefully written instructions block(this defines agent behavior and output format)
 # instructions: controls how the LLM behaves - adjust tone, rquired outputs, and error handling here.
+# Prompt caching: agno renders description + instructions into one system message ahead of
+# the history and the user turn. Keep that prefix static (no datetime/session state in it)
+# so OpenAI can reuse the cached prefix on every request. The session summary is appended
+# after the instructions, so an updated summary only changes the tail of the prompt.
 # ------------------------------------------------------------
-swimbench_ai_agent = Agent(
+class SwimAnalysis(BaseModel):
+    """Structured result of a time analysis, rendered to markdown by render_swim_analysis()."""
+
+    time: str = Field(..., description="Formatted swim time, e.g. 54.21 or 1:58.33")
+    event: str = Field(..., description="Event, e.g. 100 Free")
+    course: str = Field(..., description="SCY, SCM or LCM")
+    percentile: float = Field(..., description="Percentile ranking within the age group (0-100)")
+    usa_standard: str = Field(..., description="Highest USA Swimming standard achieved: AAAA/AAA/AA/A/BB/B or None")
+    ability_level: str = Field(..., description="Elite/Advanced/Intermediate/Novice/Beginner")
+    d1_elite_qualified: bool
+    d1_mid_major_qualified: bool
+    d2_qualified: bool
+    d3_qualified: bool
+    next_standard: str = Field(..., description="Next standard and its cutoff time, e.g. 53.09 (AAAA)")
+    time_drop_needed: float = Field(..., description="Seconds to drop to reach the next standard")
+    training_focus: str = Field(..., description="Specific training recommendations")
+
+class SwimBenchResponse(BaseModel):
+    """Agent output: an analysis for time analysis requests, a markdown answer for everything else."""
+
+    analysis: Optional[SwimAnalysis] = None
+    answer: Optional[str] = None
+
+# Markdown report for a time analysis. Filled in by render_swim_analysis() for structured
+# responses, and shown to the model with placeholders when it writes the report itself (streaming).
+ANALYSIS_TEMPLATE = "\n".join([
+    "🏊‍♂️ Swim Performance Analysis",
+    "",
+    "📊 Performance Summary",
+    "- Time: {time} ({event} {course})",
+    "- Percentile Ranking: {percentile}% (Top {top_percent}% nationally)",
+    "- USA Swimming Standard: {usa_standard}",
+    "- Ability Level: {ability_level}",
+    "",
+    "🎓 College Recruitment Analysis",
+    "- D1 Elite Programs: {d1_elite}",
+    "- D1 Mid-Major: {d1_mid_major}",
+    "- D2 Programs: {d2}",
+    "- D3 Programs: {d3}",
+    "",
+    "🎯 Next Goals",
+    "- Next Standard: {next_standard}",
+    "- Time Drop Needed: {time_drop_needed}s",
+    "- Training Focus: {training_focus}",
+])
+
+ANALYSIS_PLACEHOLDERS = {
+    "time": "[formatted time]",
+    "event": "[event]",
+    "course": "[course]",
+    "percentile": "[X]",
+    "top_percent": "[X]",
+    "usa_standard": "[AAAA/AAA/AA/A/BB/B]",
+    "ability_level": "[Elite/Advanced/Intermediate/Novice/Beginner]",
+    "d1_elite": "[Qualified/Not Qualified] ✅/❌",
+    "d1_mid_major": "[Qualified/Not Qualified] ✅/❌",
+    "d2": "[Qualified/Not Qualified] ✅/❌",
+    "d3": "[Qualified/Not Qualified] ✅/❌",
+    "next_standard": "[time needed for next level]",
+    "time_drop_needed": "[X.XX]",
+    "training_focus": "[specific recommendations]",
+}
+
+def render_swim_analysis(analysis: SwimAnalysis) -> str:
+    """Renders an analysis into the SwimBench markdown report."""
+    def qualified(value: bool) -> str:
+        return "✅ Qualified" if value else "❌ Not Qualified"
+
+    return ANALYSIS_TEMPLATE.format(
+        time=analysis.time,
+        event=analysis.event,
+        course=analysis.course,
+        percentile=f"{analysis.percentile:g}",
+        top_percent=f"{100 - analysis.percentile:g}",
+        usa_standard=analysis.usa_standard,
+        ability_level=analysis.ability_level,
+        d1_elite=qualified(analysis.d1_elite_qualified),
+        d1_mid_major=qualified(analysis.d1_mid_major_qualified),
+        d2=qualified(analysis.d2_qualified),
+        d3=qualified(analysis.d3_qualified),
+        next_standard=analysis.next_standard,
+        time_drop_needed=f"{analysis.time_drop_needed:.2f}",
+        training_focus=analysis.training_focus,
+    )
+
+def render_response(content) -> str:
+    """Turns the agent's structured output into the markdown shown to the user."""
+    if isinstance(content, SwimBenchResponse):
+        if content.analysis is not None:
+            return render_swim_analysis(content.analysis)
+        return content.answer or ""
+    return str(content) if content is not None else ""
+
+SWIMBENCH_INSTRUCTIONS = [
+    "You are SWIMBENCH AI, a specialized swim performance benchmarking assistant with expertise in swimming analysis.",
+    
+    "## PRIMARY FOCUS - Performance Analysis:",
+    "- Benchmark swim times against USA Swimming motivational standards (B, BB, A, AA, AAA, AAAA)",
+    "- Calculate percentile rankings within age groups", 
+    "- Assess college recruitment readiness across D1/D2/D3 divisions",
+    "- Provide performance improvement recommendations and time targets",
+    
+    "## SECONDARY FOCUS - Swimming Related Topics:",
+    "You can answer swimming-related questions including:",
+    "- Swimming events and stroke techniques",
+    "- Training concepts and season planning",
+    "- Meet preparation and competition strategy", 
+    "- Swimming standards and time progressions",
+    "- Age group swimming and development",
+    "- College swimming recruitment process",
+    
+    "## SCOPE RESTRICTIONS:",
+    "- ONLY respond to swimming-related topics",
+    "- DO NOT discuss non-swimming sports, general fitness, or unrelated subjects",
+    "- Always prioritize time analysis requests over general swimming questions",
+    "- If asked non-swimming questions, politely redirect: 'I specialize in swimming analysis. Do you have a swim time to benchmark?'",
+    
+    "## Required Input Validation for Analysis:",
+    "When users request time analysis, collect:",
+    "1. **Event** (e.g., '100_freestyle', '200_backstroke')",
+    "2. **Age** (8-18 years old)",  
+    "3. **Time** (format: MM:SS.SS or SS.SS)",
+
+    "If the following are not provided, use defaults value, don't ask to user about these input:",
+    "1. **Gender** (M/F) - default M if not specified",
+    "2. **Course** (SCY/SCM/LCM) - default SCY if not specified",
+
+    "## Database Query Strategy:",
+    "0. For a time analysis, call benchmark_time first - it returns the standard achieved, the next standard and the time drop",
+    "1. Query ai.usa_swimming_standards for age group standards - always use SQL for standards, not knowledge search:",
+    "   SELECT standard_level, cutoff_time FROM ai.usa_swimming_standards WHERE event = '100_freestyle' AND age_group = '15-16' AND gender = 'M' AND course = 'SCY' ORDER BY cutoff_time",
+    "   (age_group: 10-under, 11-12, 13-14, 15-16, 17-18; cutoff_time is in seconds)",
+    "2. Query ai.college_recruiting_standards for recruitment benchmarks", 
+    "3. Store analysis in ai.performance_analyses table",
+    "4. If exact age group not found, use closest age group and explain",
+    "5. Use knowledge search for recruiting context and general swimming questions",
+    
+    "## General Swimming Questions Format:",
+    "For non-analysis swimming questions, provide helpful answers but always conclude with:",
+    "'Would you like me to analyze any specific swim times? I can benchmark performance against USA Swimming standards and college recruiting times.'",
+    
+    "## Error Handling:",
+    "- If database query fails, explain clearly and suggest trying again",
+    "- If event not found, list available events: 50_freestyle, 100_freestyle, 200_freestyle, 500_freestyle, 1650_freestyle, 100_backstroke, 200_backstroke, 100_breaststroke, 200_breaststroke, 100_butterfly, 200_butterfly, 200_im, 400_im",
+    "- If age out of range, explain USA Swimming age groups (10-under, 11-12, 13-14, 15-16, 17-18)",
+    "- If unrealistic times provided, ask for verification",
+    
+    "## Response Priorities (In Order):",
+    "1. **Time Analysis Requests** - Highest priority, use database queries",
+    "2. **Swimming Performance Questions** - Provide expert guidance", 
+    "3. **General Swimming Topics** - Helpful but brief responses",
+    "4. **Non-Swimming Topics** - Polite redirect to swimming focus",
+    
+    "## Response Style:",
+    "- Use encouraging, knowledgeable coach-like tone",
+    "- Include relevant emojis for visual appeal", 
+    "- Be specific with times, percentages, and data",
+    "- Balance technical accuracy with accessibility",
+    "- Always offer to perform time analysis when relevant",
+    
+    "## Available Events Reference:",
+    "Standard USA Swimming events: 50FR, 100FR, 200FR, 500FR, 1650FR, 100BK, 200BK, 100BR, 200BR, 100FL, 200FL, 200IM, 400IM (SCY/SCM/LCM)",
+    
+    "REMEMBER: Performance analysis is your core strength. Use every interaction to offer benchmarking services while being helpful on all swimming topics."
+]
+
+# Structured output (SwimBenchResponse): the report is rendered server side
+STRUCTURED_RESPONSE_FORMAT = [
+    "## Response Format:",
+    "- For time analysis requests, fill in `analysis` (it is rendered into the analysis report for you) and leave `answer` empty",
+    "- For everything else, put your markdown reply in `answer` and leave `analysis` empty",
+]
+
+# Plain markdown (AgentOS runs and /chat/stream): the model writes the report itself
+MARKDOWN_RESPONSE_FORMAT = [
+    "## Performance Analysis Output Format (REQUIRED):",
+    "For time analysis requests, use this EXACT format:",
+    "```markdown",
+    ANALYSIS_TEMPLATE.format(**ANALYSIS_PLACEHOLDERS),
+    "```",
+    "Use markdown to format your answers.",
+]
+
+# gpt-4o-mini's last message is dropped before gpt-4o writes the reply, so it is kept to one word
+TOOL_LOOP_FORMAT = [
+    "## Final Message:",
+    "The reply to the user is written separately from this conversation and your tool results.",
+    "Once the tool results cover everything the reply needs (or no tools are needed), end your turn with just: DONE",
+]
+
+def get_output_model_prompt(response_format: List[str]) -> str:
+    """System prompt for gpt-4o, which replaces the agent's own when it writes the reply."""
+    return "\n".join([
+        *SWIMBENCH_INSTRUCTIONS,
+        "## Writing The Reply:",
+        "The tools have already been called for this conversation. Reply to the user's last message "
+        "using their results; don't mention the tools or say you will look something up.",
+        *response_format,
+    ])
+
+SESSION_SUMMARY = re.compile(r"<summary_of_previous_interactions>.*?</summary_of_previous_interactions>", re.DOTALL)
+
+class SwimBenchAgent(Agent):
+    """
+    The model only runs the tool loop and output_model writes the reply. agno would ask the
+    tool loop's last message (which it then drops) for output_schema, so the output model gets it.
+    """
+    def _get_response_format(self, model=None):
+        if self.output_model is not None and (model or self.model) is self.model:
+            return None
+        return super()._get_response_format(model)
+
+    def _get_messages_for_output_model(self, messages):
+        # output_model_prompt replaces the system message, which is where agno puts the session
+        # summary; carry the summary over so the reply covers turns older than the history too
+        system = next((message for message in messages if message.role == "system"), None)
+        summary = SESSION_SUMMARY.search(system.content) if system and isinstance(system.content, str) else None
+        messages = super()._get_messages_for_output_model(messages)
+        if summary:
+            system = next(message for message in messages if message.role == "system")
+            system.content += (
+                "\n\nHere is a brief summary of your previous interactions (prefer the conversation "
+                f"itself where they differ):\n{summary.group(0)}"
+            )
+        return messages
+
+    async def _agenerate_response_with_output_model(self, model_response, run_messages):
+        if self.output_model is None:
+            return
+        messages_for_output_model = self._get_messages_for_output_model(run_messages.messages)
+        output_model_response = await self.output_model.aresponse(
+            messages=messages_for_output_model,
+            response_format=self._get_response_format(self.output_model),
+        )
+        model_response.content = output_model_response.content
+
+NUM_HISTORY_RUNS = 4
+
+@dataclass
+class HistorySummaryManager(SessionSummaryManager):
+    """
+    Only summarizes once earlier runs are falling out of the last NUM_HISTORY_RUNS sent verbatim.
+    agno awaits the summary inside every run, so short sessions skip that extra gpt-4o-mini call.
+    """
+    def create_session_summary(self, session):
+        # session.runs doesn't include the run being finished yet
+        if len(session.runs or []) < NUM_HISTORY_RUNS:
+            return None
+        return super().create_session_summary(session)
+
+    async def acreate_session_summary(self, session):
+        if len(session.runs or []) < NUM_HISTORY_RUNS:
+            return None
+        return await super().acreate_session_summary(session)
+
+swimbench_ai_agent = SwimBenchAgent(
     name="SWIMBENCH AI",
+    # gpt-4o-mini runs the tool loop (reasoning steps, event/age/time extraction, SQL);
+    # gpt-4o only writes the final answer from the tool results, streamed as it is generated.
     model=OpenAIChat(
-        id="gpt-4o", 
-        temperature=0.1
+        id="gpt-4o-mini",
+        temperature=0.1,
+        request_params={"prompt_cache_key": "swimbench-ai"}, # route requests sharing the prefix to the same cache
     ),
-    instructions=[
-        "You are SWIMBENCH AI, a specialized swim performance benchmarking assistant with expertise in swimming analysis.",
-        
-        "## PRIMARY FOCUS - Performance Analysis:",
-        "- Benchmark swim times against USA Swimming motivational standards (B, BB, A, AA, AAA, AAAA)",
-        "- Calculate percentile rankings within age groups", 
-        "- Assess college recruitment readiness across D1/D2/D3 divisions",
-        "- Provide performance improvement recommendations and time targets",
-        
-        "## SECONDARY FOCUS - Swimming Related Topics:",
-        "You can answer swimming-related questions including:",
-        "- Swimming events and stroke techniques",
-        "- Training concepts and season planning",
-        "- Meet preparation and competition strategy", 
-        "- Swimming standards and time progressions",
-        "- Age group swimming and development",
-        "- College swimming recruitment process",
-        
-        "## SCOPE RESTRICTIONS:",
-        "- ONLY respond to swimming-related topics",
-        "- DO NOT discuss non-swimming sports, general fitness, or unrelated subjects",
-        "- Always prioritize time analysis requests over general swimming questions",
-        "- If asked non-swimming questions, politely redirect: 'I specialize in swimming analysis. Do you have a swim time to benchmark?'",
-        
-        "## Required Input Validation for Analysis:",
-        "When users request time analysis, collect:",
-        "1. **Event** (e.g., '100_freestyle', '200_backstroke')",
-        "2. **Age** (8-18 years old)",  
-        "3. **Time** (format: MM:SS.SS or SS.SS)",
-
-        "If the following are not provided, use defaults value, don't ask to user about these input:",
-        "1. **Gender** (M/F) - default M if not specified",
-        "2. **Course** (SCY/SCM/LCM) - default SCY if not specified",
-
-        "## Database Query Strategy:",
-        "1. Query ai.usa_swimming_standards for age group standards",
-        "2. Query ai.college_recruiting_standards for recruitment benchmarks", 
-        "3. Store analysis in ai.performance_analyses table",
-        "4. If exact age group not found, use closest age group and explain",
-        
-        "## Performance Analysis Output Format (REQUIRED):",
-        "For time analysis requests, use this EXACT format:",
-        "```markdown",
-        " 🏊‍♂️ Swim Performance Analysis",
-        "",
-        " 📊 Performance Summary",
-        "- Time: [formatted time] ([event] [course])", 
-        "- Percentile Ranking: [X]% (Top [X]% nationally)",
-        "- USA Swimming Standard: [AAAA/AAA/AA/A/BB/B]",
-        "- Ability Level: [Elite/Advanced/Intermediate/Novice/Beginner]",
-        "",
-        " 🎓 College Recruitment Analysis",
-        "- D1 Elite Programs: [Qualified/Not Qualified] ✅/❌",
-        "- D1 Mid-Major: [Qualified/Not Qualified] ✅/❌", 
-        "- D2 Programs: [Qualified/Not Qualified] ✅/❌",
-        "- D3 Programs: [Qualified/Not Qualified] ✅/❌",
-        "",
-        " 🎯 Next Goals",
-        "- Next Standard: [time needed for next level]",
-        "- Time Drop Needed: [X.XX seconds]",
-        "- Training Focus: [specific recommendations]",
-        "```",
-        
-        "## General Swimming Questions Format:",
-        "For non-analysis swimming questions, provide helpful answers but always conclude with:",
-        "'Would you like me to analyze any specific swim times? I can benchmark performance against USA Swimming standards and college recruiting times.'",
-        
-        "## Error Handling:",
-        "- If database query fails, explain clearly and suggest trying again",
-        "- If event not found, list available events: 50_freestyle, 100_freestyle, 200_freestyle, 500_freestyle, 1650_freestyle, 100_backstroke, 200_backstroke, 100_breaststroke, 200_breaststroke, 100_butterfly, 200_butterfly, 200_im, 400_im",
-        "- If age out of range, explain USA Swimming age groups (10-under, 11-12, 13-14, 15-16, 17-18)",
-        "- If unrealistic times provided, ask for verification",
-        
-        "## Response Priorities (In Order):",
-        "1. **Time Analysis Requests** - Highest priority, use database queries",
-        "2. **Swimming Performance Questions** - Provide expert guidance", 
-        "3. **General Swimming Topics** - Helpful but brief responses",
-        "4. **Non-Swimming Topics** - Polite redirect to swimming focus",
-        
-        "## Response Style:",
-        "- Use encouraging, knowledgeable coach-like tone",
-        "- Include relevant emojis for visual appeal", 
-        "- Be specific with times, percentages, and data",
-        "- Balance technical accuracy with accessibility",
-        "- Always offer to perform time analysis when relevant",
-        
-        "## Available Events Reference:",
-        "Standard USA Swimming events: 50FR, 100FR, 200FR, 500FR, 1650FR, 100BK, 200BK, 100BR, 200BR, 100FL, 200FL, 200IM, 400IM (SCY/SCM/LCM)",
-        
-        "REMEMBER: Performance analysis is your core strength. Use every interaction to offer benchmarking services while being helpful on all swimming topics."
-    ],
+    output_model=OpenAIChat(
+        id="gpt-4o",
+        temperature=0.1,
+        request_params={"prompt_cache_key": "swimbench-ai"},
+    ),
+    output_model_prompt=get_output_model_prompt(MARKDOWN_RESPONSE_FORMAT),
+    instructions=[*SWIMBENCH_INSTRUCTIONS, *TOOL_LOOP_FORMAT],
 
     description="SWIMBENCH AI: Advanced swim performance benchmarking system with real USA Swimming and college recruiting data",
     db=db,
     knowledge=knowledge,
-    num_history_runs=15,            # keep conversational memory
+    add_history_to_context=True,    # history goes after the system prompt, before the user turn
+    num_history_runs=NUM_HISTORY_RUNS,  # only the last few turns verbatim...
+    session_summary_manager=HistorySummaryManager(
+        model=OpenAIChat(id="gpt-4o-mini", temperature=0.1),
+    ),
+    add_session_summary_to_context=True,  # ...older ones as a running summary (end of the system prompt)
     search_knowledge=True,          # enable retrieval from knowledge base
-    markdown=True,                  # respond with markdown formatting
-    tools=[ReasoningTools(), postgres_tools],
+    # No metadata filters on retrieval: a WHERE meta_data @> ... next to ORDER BY embedding <=> ...
+    # makes Postgres post-filter instead of walking the HNSW index, and with one tag per
+    # document the filter doesn't narrow anything down anyway.
+    knowledge_filters=None,
+    enable_agentic_knowledge_filters=False,
+    tools=[ReasoningTools(), swimbench_tools, postgres_tools],
+)
+
+# /chat's copy of the agent, with structured output rendered server side (render_response()).
+# AgentOS and /chat/stream keep the markdown agent: agno can't stream structured output, and
+# the frontend's /agents/{id}/runs expects the markdown report.
+# Shares db, knowledge, tools, models and session summaries with the main agent.
+swimbench_structured_agent = swimbench_ai_agent.deep_copy(
+    update={
+        "output_schema": SwimBenchResponse,  # gpt-4o answers in the schema (see SwimBenchAgent)
+        "output_model_prompt": get_output_model_prompt(STRUCTURED_RESPONSE_FORMAT),
+        "model": swimbench_ai_agent.model,
+        "output_model": swimbench_ai_agent.output_model,
+        "db": db,
+        "knowledge": knowledge,
+        "tools": swimbench_ai_agent.tools,
+        "session_summary_manager": swimbench_ai_agent.session_summary_manager,
+    }
 )
 
 # ------------------------------------------------------------
 # 6. AgentOS (Runtime Container)
 # ------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Runs the startup/shutdown hooks (section 10). AgentOS always gives the FastAPI app a
+    lifespan, and Starlette ignores @app.on_event handlers when one is set.
+    """
+    await on_startup()
+    yield
+    await on_shutdown()
+
 agent_os = AgentOS(
     os_id="swimbench-os",
     description="SwimBench AI Performance Benchmarking System",
     agents=[swimbench_ai_agent],
+    lifespan=lifespan,
 )
 
 app = agent_os.get_app() # get FastAPI app from AgentOS
@@ -209,62 +866,806 @@ app = agent_os.get_app() # get FastAPI app from AgentOS
 # ------------------------------------------------------------
 # 7. Middleware (CORS for frontend)
 # ------------------------------------------------------------
-if ENV == "production":
+# Explicit origins: browsers reject allow_origins=["*"] together with credentials.
+# max_age lets browsers cache the preflight for a day instead of sending OPTIONS every call.
+if settings.env == "production":
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],
+        allow_origins=settings.cors_origins,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        max_age=86400,
     )
 
 # ------------------------------------------------------------
-# 8. Custom Endpoints
+# 8. Semantic Cache
+# Caches agent responses keyed by query embedding; a near-identical question
+# (cosine distance < SEMANTIC_CACHE_MAX_DISTANCE) is answered without calling gpt-4o.
 # ------------------------------------------------------------
-@app.post("/loadknowledge")
-async def load_knowledge():
+SEMANTIC_CACHE_TABLE = f"{vector_db.schema}.semantic_cache"
+SEMANTIC_CACHE_MAX_DISTANCE = 0.03  # ~0.97 cosine similarity
+SEMANTIC_CACHE_MAX_ENTRIES = 10000  # oldest entries are evicted past this
+
+def create_semantic_cache() -> None:
+    """Creates the semantic_cache table and its indexes if they don't exist."""
+    with vector_db.Session() as sess, sess.begin():
+        sess.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {SEMANTIC_CACHE_TABLE} ("
+                "id BIGSERIAL PRIMARY KEY, "
+                "query TEXT NOT NULL, "
+                f"query_embedding vector({vector_db.dimensions}) NOT NULL, "
+                "response JSONB NOT NULL, "
+                "canonical BOOLEAN NOT NULL DEFAULT false, "
+                "created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+        )
+        # Tables created before canonical queries were seeded
+        sess.execute(
+            text(f"ALTER TABLE {SEMANTIC_CACHE_TABLE} ADD COLUMN IF NOT EXISTS canonical BOOLEAN NOT NULL DEFAULT false")
+        )
+        sess.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS semantic_cache_embedding_hnsw ON {SEMANTIC_CACHE_TABLE} "
+                "USING hnsw (query_embedding vector_cosine_ops)"
+            )
+        )
+        sess.execute(
+            text(f"CREATE INDEX IF NOT EXISTS semantic_cache_created_at ON {SEMANTIC_CACHE_TABLE} (created_at)")
+        )
+        sess.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS semantic_cache_canonical_query ON {SEMANTIC_CACHE_TABLE} (query) "
+                "WHERE canonical"
+            )
+        )
+
+def normalize_query(query: str) -> str:
+    """Lowercases and collapses whitespace/trailing punctuation so trivially different phrasings match."""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+# The specifics a cached answer depends on. Questions that differ only in one of these embed
+# almost identically, so they have to agree as well as the embeddings.
+QUERY_NUMBER = re.compile(r"\d+(?:[:.]\d+)*")
+QUERY_LEVEL = re.compile(r"\b(?:[Aa]{2,4}|[Bb]{2}|A|B)\b")  # lone lowercase a/b are just words
+QUERY_GENDER = re.compile(r"\b(?:(?P<female>girls?|wom[ae]n|females?|ladies)|(?P<male>boys?|m[ae]n|males?))\b", re.IGNORECASE)
+QUERY_COURSE = re.compile(r"\b(?:SCY|SCM|LCM)\b", re.IGNORECASE)
+
+def query_specifics(query: str) -> Tuple:
     """
-    Endpoint to (re)load swim performance documents into the knowledge base.
-    Loads:
-      1. USA Swimming Motivational Standards
-      2. College recruiting times
+    The numbers (times, ages, distances; in any order), standard levels, genders and courses
+    in a query, which must all agree for a cached answer to apply.
+    """
+    return (
+        sorted(QUERY_NUMBER.findall(query)),
+        {level.upper() for level in QUERY_LEVEL.findall(query)},
+        {"F" if match["female"] else "M" for match in QUERY_GENDER.finditer(query)},
+        {course.upper() for course in QUERY_COURSE.findall(query)},
+    )
+
+def lookup_canonical_query(query: str) -> Optional[Dict]:
+    """Returns the seeded response for an exact (normalized) canonical query, without embedding it."""
+    with vector_db.Session() as sess, sess.begin():
+        return sess.execute(
+            text(f"SELECT response FROM {SEMANTIC_CACHE_TABLE} WHERE canonical AND query = :query LIMIT 1"),
+            {"query": normalize_query(query)},
+        ).scalar()
+
+def lookup_semantic_cache(query: str, query_embedding: List[float]) -> Optional[Dict]:
+    """
+    Returns the cached response closest to query_embedding, if it is within the distance threshold
+    and the cached query has the same specifics (see query_specifics).
+    """
+    with vector_db.Session() as sess, sess.begin():
+        rows = sess.execute(
+            text(
+                f"SELECT query, response, query_embedding <=> CAST(:embedding AS vector) AS distance "
+                f"FROM {SEMANTIC_CACHE_TABLE} "
+                "ORDER BY query_embedding <=> CAST(:embedding AS vector) LIMIT 5"
+            ),
+            {"embedding": str(query_embedding)},
+        ).all()
+
+    specifics = query_specifics(query)
+    for row in rows:
+        if row.distance >= SEMANTIC_CACHE_MAX_DISTANCE:
+            break
+        if query_specifics(row.query) == specifics:
+            return row.response
+    return None
+
+def store_semantic_cache(query: str, query_embedding: List[float], response: Dict) -> None:
+    """Stores a response and evicts the oldest entries beyond SEMANTIC_CACHE_MAX_ENTRIES."""
+    with vector_db.Session() as sess, sess.begin():
+        sess.execute(
+            text(
+                f"INSERT INTO {SEMANTIC_CACHE_TABLE} (query, query_embedding, response) "
+                "VALUES (:query, CAST(:embedding AS vector), CAST(:response AS jsonb))"
+            ),
+            {"query": query, "embedding": str(query_embedding), "response": json.dumps(response)},
+        )
+        sess.execute(
+            text(
+                f"DELETE FROM {SEMANTIC_CACHE_TABLE} WHERE id IN ("
+                f"SELECT id FROM {SEMANTIC_CACHE_TABLE} WHERE NOT canonical "
+                "ORDER BY created_at DESC OFFSET :max_entries)"
+            ),
+            {"max_entries": SEMANTIC_CACHE_MAX_ENTRIES},
+        )
+
+def clear_stored_responses() -> None:
+    """Removes every response stored by /chat, keeping the seeded canonical queries."""
+    with vector_db.Session() as sess, sess.begin():
+        sess.execute(text(f"DELETE FROM {SEMANTIC_CACHE_TABLE} WHERE NOT canonical"))
+
+def has_canonical_queries() -> bool:
+    with vector_db.Session() as sess:
+        return sess.execute(text(f"SELECT EXISTS (SELECT 1 FROM {SEMANTIC_CACHE_TABLE} WHERE canonical)")).scalar()
+
+def replace_canonical_queries(entries: List[Tuple[str, List[float], Dict]]) -> None:
+    """Replaces the seeded (query, embedding, response) entries; these are never evicted."""
+    with vector_db.Session() as sess, sess.begin():
+        sess.execute(text(f"DELETE FROM {SEMANTIC_CACHE_TABLE} WHERE canonical"))
+        if not entries:
+            return
+        sess.execute(
+            text(
+                f"INSERT INTO {SEMANTIC_CACHE_TABLE} (query, query_embedding, response, canonical) "
+                "VALUES (:query, CAST(:embedding AS vector), CAST(:response AS jsonb), true)"
+            ),
+            [
+                {"query": normalize_query(query), "embedding": str(embedding), "response": json.dumps(response)}
+                for query, embedding, response in entries
+            ],
+        )
+
+# ------------------------------------------------------------
+# 9. USA Swimming Standards (structured)
+# The motivational standards are a dense event x age x gender x course table, so they are
+# parsed out of the PDF into ai.usa_swimming_standards and looked up with SQL instead of
+# being embedded and retrieved by similarity.
+# ------------------------------------------------------------
+USA_STANDARDS_URL = "https://websitedevsa.blob.core.windows.net/sitefinity/docs/default-source/timesdocuments/time-standards/2025/2028-motivational-standards-age-group.pdf"
+USA_STANDARDS_TABLE = "usa_swimming_standards"
+
+STANDARDS_COLUMNS = ["event", "age_group", "gender", "course", "standard_level", "cutoff_time"]
+
+async def migrate_legacy_standards_table(conn) -> None:
+    """
+    Moves an ai.usa_swimming_standards created with a different layout (e.g. the one the
+    README used to describe) out of the way, so the structured table can be created.
+    """
+    columns = {
+        row["column_name"]
+        for row in await conn.fetch(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = 'ai' AND table_name = $1",
+            USA_STANDARDS_TABLE,
+        )
+    }
+    if not columns or set(STANDARDS_COLUMNS) <= columns:
+        return
+
+    legacy_table = f"{USA_STANDARDS_TABLE}_legacy_{datetime.now():%Y%m%d%H%M%S}"
+    logger.warning(f"ai.{USA_STANDARDS_TABLE} has an old layout, renaming it to ai.{legacy_table}")
+    await conn.execute(f"ALTER TABLE ai.{USA_STANDARDS_TABLE} RENAME TO {legacy_table}")
+    # An index with the lookup name on the old table would make CREATE INDEX IF NOT EXISTS a no-op
+    await conn.execute("DROP INDEX IF EXISTS ai.usa_swimming_standards_lookup")
+
+async def load_usa_swimming_standards() -> int:
+    """Downloads and parses the standards PDF and replaces the contents of ai.usa_swimming_standards."""
+    async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
+        response = await client.get(USA_STANDARDS_URL)
+        response.raise_for_status()
+
+    rows = await asyncio.to_thread(parse_usa_standards, response.content)
+    # Rather keep the previous load than replace it with a partial parse
+    missing = sorted(set(AGE_GROUPS) - {row[1] for row in rows})
+    if missing:
+        raise ValueError(f"no standards rows parsed from the USA Swimming PDF for: {', '.join(missing)}")
+
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await migrate_legacy_standards_table(conn)
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS ai.{USA_STANDARDS_TABLE} ("
+                "event TEXT NOT NULL, "
+                "age_group TEXT NOT NULL, "
+                "gender CHAR(1) NOT NULL, "
+                "course TEXT NOT NULL, "
+                "standard_level TEXT NOT NULL, "
+                "cutoff_time NUMERIC(7, 2) NOT NULL)"
+            )
+            await conn.execute(
+                f"CREATE INDEX IF NOT EXISTS usa_swimming_standards_lookup "
+                f"ON ai.{USA_STANDARDS_TABLE} (event, age_group, gender, course)"
+            )
+            await conn.execute(f"TRUNCATE ai.{USA_STANDARDS_TABLE}")
+            await conn.copy_records_to_table(
+                USA_STANDARDS_TABLE,
+                schema_name="ai",
+                columns=STANDARDS_COLUMNS,
+                records=rows,
+            )
+
+    swimbench_tools.clear_cache()
+    logger.info(f"Loaded {len(rows)} USA Swimming standards into ai.{USA_STANDARDS_TABLE}")
+    return len(rows)
+
+# Common standards questions are answered straight from the table. Each cut is seeded into the
+# semantic cache as a canonical question, so these never reach gpt-4o (and exact phrasings
+# aren't even embedded, see lookup_canonical_query).
+CANONICAL_EMBED_BATCH_SIZE = 1024  # short strings, so a few embeddings requests cover every cut
+
+def describe_standard(event: str, age_group: str, gender: str, course: str) -> str:
+    """e.g. ('100_freestyle', '13-14', 'F', 'SCY') -> '13-14 girls 100 freestyle SCY'."""
+    distance, stroke = event.split("_", 1)
+    age_label = "10 & under" if age_group == "10-under" else age_group
+    gender_label = "girls" if gender == "F" else "boys"
+    stroke_label = "IM" if stroke == "im" else stroke
+    return f"{age_label} {gender_label} {distance} {stroke_label} {course}"
+
+async def seed_standard_queries() -> int:
+    """Embeds a canonical question for every cut in ai.usa_swimming_standards and caches its answer."""
+    pool = await get_pg_pool()
+    if not await pool.fetchval("SELECT to_regclass($1) IS NOT NULL", f"ai.{USA_STANDARDS_TABLE}"):
+        return 0
+    rows = await pool.fetch(
+        "SELECT event, age_group, gender, course, standard_level, cutoff_time "
+        f"FROM ai.{USA_STANDARDS_TABLE} ORDER BY event, age_group, gender, course, cutoff_time DESC"
+    )
+    if not rows:
+        return 0
+
+    queries, responses = [], []
+    for row in rows:
+        standard = describe_standard(row["event"], row["age_group"], row["gender"], row["course"])
+        cutoff = seconds_to_time(float(row["cutoff_time"]))
+        queries.append(f"What is the {row['standard_level']} time for {standard}?")
+        responses.append(
+            {"content": f"The USA Swimming {row['standard_level']} motivational standard for {standard} is {cutoff}."}
+        )
+
+    embeddings = await vector_db.embedder.async_get_embeddings_batch(queries, CANONICAL_EMBED_BATCH_SIZE)
+    # Texts whose embeddings request failed come back as None
+    entries = [entry for entry in zip(queries, embeddings, responses) if entry[1]]
+    if len(entries) < len(queries):
+        logger.warning(f"Skipping {len(queries) - len(entries)} canonical standards queries that failed to embed")
+
+    await asyncio.to_thread(replace_canonical_queries, entries)
+    logger.info(f"Seeded {len(entries)} canonical standards queries into {SEMANTIC_CACHE_TABLE}")
+    return len(entries)
+
+# ------------------------------------------------------------
+# 10. Startup Hooks
+# ------------------------------------------------------------
+def get_hnsw_index_params() -> Dict[str, int]:
+    """Returns the m/ef_construction the existing HNSW index was built with ({} if none)."""
+    with vector_db.Session() as sess:
+        row = sess.execute(
+            text(
+                "SELECT c.reloptions FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = :schema AND c.relname = :name"
+            ),
+            {"schema": vector_db.schema, "name": HNSW_INDEX_NAME},
+        ).first()
+
+    if not row or not row[0]:
+        return {}
+    return {key: int(value) for key, value in (option.split("=", 1) for option in row[0])}
+
+def migrate_embeddings_to_halfvec() -> None:
+    """
+    Converts an existing FP32 vectors.embedding column to halfvec.
+    The old vector_cosine_ops index can't be reused, so it is dropped and rebuilt by tune_vector_index().
+    """
+    if not vector_db.table_exists():
+        return
+
+    with vector_db.Session() as sess, sess.begin():
+        column_type = sess.execute(
+            text(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :table AND column_name = 'embedding'"
+            ),
+            {"schema": vector_db.schema, "table": vector_db.table_name},
+        ).scalar()
+        if column_type != "vector":
+            return
+
+        logger.info(f"Migrating {vector_db.table.fullname}.embedding to halfvec({vector_db.dimensions})...")
+        sess.execute(text(f'DROP INDEX IF EXISTS "{vector_db.schema}"."{HNSW_INDEX_NAME}"'))
+        sess.execute(
+            text(
+                f"ALTER TABLE {vector_db.table.fullname} "
+                f"ALTER COLUMN embedding TYPE halfvec({vector_db.dimensions}) "
+                f"USING embedding::halfvec({vector_db.dimensions})"
+            )
+        )
+
+def tune_vector_index() -> None:
+    """
+    Sizes the HNSW index to the number of stored vectors.
+    The index is only dropped and rebuilt when the size tier (and so m/ef_construction) changes.
+    """
+    vector_db.create()
+    vector_count = vector_db.get_count()
+    vector_db.vector_index = configure_hnsw_params(vector_count)
+
+    existing = get_hnsw_index_params()
+    wanted = {"m": vector_db.vector_index.m, "ef_construction": vector_db.vector_index.ef_construction}
+    # Only the vector index: PgVector.optimize() also builds a full-text GIN index, which
+    # hybrid search would need but vector search doesn't (and its DDL fails on agno 2.0.4).
+    vector_db._create_vector_index(force_recreate=bool(existing) and existing != wanted)
+
+    logger.info(
+        f"HNSW index '{HNSW_INDEX_NAME}' ready for {vector_count} vectors "
+        f"(m={wanted['m']}, ef_construction={wanted['ef_construction']}, "
+        f"ef_search={vector_db.vector_index.ef_search})"
+    )
+
+async def build_vector_index():
+    """
+    Ensures the vectors table and a correctly sized HNSW index exist before serving requests.
+    Without the index every knowledge search is a sequential scan over all embeddings.
     """
     try:
-        logger.info("Starting SwimBench knowledge loading...")
-        await knowledge.clear()
-
-        # Load USA Swimming standards
-        result1 = await knowledge.add_content_async(
-            name="USA Swimming Motivational Time Standards 2024-2028",
-            url="https://websitedevsa.blob.core.windows.net/sitefinity/docs/default-source/timesdocuments/time-standards/2025/2028-motivational-standards-age-group.pdf",
-            metadata={
-                "user_tag": "USA Swimming Standards", 
-                "content_type": "standards", 
-                "source": "PDF",
-                "year": "2024-2028"
-            }
+        await asyncio.to_thread(migrate_embeddings_to_halfvec)
+        await asyncio.to_thread(tune_vector_index)
+    except Exception as e:
+        logger.error(f"Error building vector index: {str(e)}")
+
+async def init_semantic_cache():
+    try:
+        await asyncio.to_thread(create_semantic_cache)
+    except Exception as e:
+        logger.error(f"Error creating semantic cache: {str(e)}")
+
+async def open_pg_pool():
+    try:
+        await get_pg_pool()
+    except Exception as e:
+        logger.error(f"Error opening Postgres pool: {str(e)}")
+
+# Relations read on every chat request; loaded into shared_buffers so the first
+# searches after a deploy don't walk the HNSW graph from disk.
+PREWARM_RELATIONS = [
+    f"{vector_db.schema}.{HNSW_INDEX_NAME}",
+    vector_db.table.fullname,
+    f"{vector_db.schema}.{USA_STANDARDS_TABLE}",
+    f"{vector_db.schema}.usa_swimming_standards_lookup",
+    f"{SEMANTIC_CACHE_TABLE}_embedding_hnsw",
+]
+
+async def prewarm_relations():
+    """Loads the vector index and standards table into the buffer cache with pg_prewarm."""
+    try:
+        pool = await get_pg_pool()
+        async with pool.acquire() as conn:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+            for relation in PREWARM_RELATIONS:
+                # to_regclass() is NULL for relations that don't exist yet (e.g. before the first /loadknowledge)
+                blocks = await conn.fetchval(
+                    "SELECT pg_prewarm(to_regclass($1)) WHERE to_regclass($1) IS NOT NULL", relation
+                )
+                logger.info(f"Prewarmed {relation}: {blocks or 0} blocks")
+    except Exception as e:
+        logger.error(f"Error prewarming relations: {str(e)}")
+
+async def seed_semantic_cache():
+    """
+    Seeds the canonical standards queries the first time the cache and standards table both exist.
+    Called under the knowledge load lock, so a worker that waited for another sees its rows.
+    """
+    try:
+        if not await asyncio.to_thread(has_canonical_queries):
+            await seed_standard_queries()
+    except Exception as e:
+        logger.error(f"Error seeding semantic cache: {str(e)}")
+
+async def close_pg_pool():
+    if pg_pool is not None:
+        await pg_pool.close()
+    db_engine.dispose()
+
+async def on_startup():
+    # In order: the index and cache tables must exist before they are seeded or prewarmed
+    await open_pg_pool()
+    # Every worker runs this. Under the knowledge load lock the DDL and seeding run one worker
+    # at a time (and never alongside /loadknowledge), and later workers find them done.
+    try:
+        async with knowledge_load_lock, advisory_lock(KNOWLEDGE_LOAD_LOCK_ID):
+            await build_vector_index()
+            await init_semantic_cache()
+            await seed_semantic_cache()
+    except Exception as e:
+        logger.error(f"Error taking the knowledge load lock: {str(e)}")
+    await prewarm_relations()
+
+async def on_shutdown():
+    await close_pg_pool()
+
+# ------------------------------------------------------------
+# 11. Custom Endpoints
+# ------------------------------------------------------------
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+
+async def find_cached_response(message: str) -> Tuple[Optional[Dict], Optional[List[float]]]:
+    """
+    Looks message up in the semantic cache; returns (cached response or None, its embedding).
+    The cache is only an optimization, so any error is logged and treated as a miss.
+    """
+    query_embedding = None
+    try:
+        cached = await asyncio.to_thread(lookup_canonical_query, message)
+        if cached is None:
+            query_embedding = await vector_db.embedder.async_get_embedding(message)
+            if query_embedding:
+                cached = await asyncio.to_thread(lookup_semantic_cache, message, query_embedding)
+        return cached, query_embedding
+    except Exception as e:
+        logger.error(f"Error looking up semantic cache: {str(e)}")
+        return None, query_embedding
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    """
+    Endpoint to chat with the SwimBench agent, answered from the semantic cache when possible.
+    Only the first message of a session is cached: follow-ups depend on the
+    conversation history, so the same text can need a different answer.
+    """
+    use_cache = request.session_id is None
+    cached, query_embedding = await find_cached_response(request.message) if use_cache else (None, None)
+    if cached is not None:
+        logger.info("Semantic cache hit")
+        return {**cached, "session_id": None, "cached": True}
+
+    try:
+        run = await swimbench_structured_agent.arun(
+            request.message,
+            # agno makes the first generated session_id sticky on the agent instance, which
+            # would put every new conversation into the same session
+            session_id=request.session_id or str(uuid4()),
+            user_id=request.user_id,
+            # arun() keeps agent.stream = agent.stream or stream, so one streamed run on this
+            # shared instance would otherwise turn every later call into a generator
+            stream=False,
         )
-        
-         # Load college recruiting standards
-        result2 = await knowledge.add_content_async(
-            name="College Swimming Recruiting Standards",
-            url="https://www.ncsasports.org/mens-swimming/college-swimming-recruiting-times",
-            metadata={
-                "user_tag": "College Recruiting", 
-                "content_type": "recruiting", 
-                "source": "NCSA"
+        response = {"content": render_response(run.content)}
+
+        if run.metrics:
+            logger.info(
+                f"Prompt tokens: {run.metrics.input_tokens} (cached: {run.metrics.cache_read_tokens})"
+            )
+    except Exception as e:
+        logger.error(f"Error running SwimBench agent: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error running agent: {str(e)}")
+
+    if use_cache and query_embedding and response["content"]:
+        try:
+            await asyncio.to_thread(store_semantic_cache, request.message, query_embedding, response)
+        except Exception as e:
+            logger.error(f"Error storing semantic cache entry: {str(e)}")
+
+    return {**response, "session_id": run.session_id, "cached": False}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming version of /chat: the reply is sent as server-sent events while it is generated.
+    Each event is `data: {"content": "<delta>"}`; the first carries the session_id and the
+    last is `data: [DONE]`. Not served from the semantic cache.
+    """
+    session_id = request.session_id or str(uuid4())  # see /chat
+
+    async def events():
+        # Sent up front: agno only emits RunStarted with stream_intermediate_steps
+        yield f"data: {json.dumps({'session_id': session_id})}\n\n"
+        try:
+            async for event in swimbench_ai_agent.arun(
+                request.message,
+                stream=True,
+                session_id=session_id,
+                user_id=request.user_id,
+            ):
+                if event.event == RunEvent.run_content.value and event.content:
+                    yield f"data: {json.dumps({'content': event.content})}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming SwimBench agent: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error running agent: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no", # stop nginx from buffering the stream
+        },
+    )
+
+# Documents loaded into the knowledge base by /loadknowledge
+# (the USA Swimming standards PDF is loaded as structured rows instead, see section 9)
+KNOWLEDGE_SOURCES = [
+    {
+        "label": "College Recruiting Standards",
+        "name": "College Swimming Recruiting Standards",
+        "url": "https://www.ncsasports.org/mens-swimming/college-swimming-recruiting-times",
+        "metadata": {
+            "user_tag": "College Recruiting", 
+            "content_type": "recruiting", 
+            "source": "NCSA"
+        },
+    },
+]
+
+# Only one load at a time: a second request waits, then finds everything unchanged.
+# Within a worker it waits on knowledge_load_lock without holding a connection; across workers
+# and replicas on a Postgres advisory lock. That lock is transaction-level and the transaction
+# stays open on one pooled connection for the whole load, so it also holds behind pgbouncer in
+# transaction mode (where a session-level lock could be left behind).
+KNOWLEDGE_LOAD_LOCK_ID = 5317_0001
+knowledge_load_lock = asyncio.Lock()
+
+@asynccontextmanager
+async def advisory_lock(lock_id: int):
+    """Holds a Postgres advisory lock (shared by every worker) for the duration of the block."""
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", lock_id)
+            yield
+
+async def get_source_hash(client: httpx.AsyncClient, url: str) -> Optional[str]:
+    """
+    sha256 of the url + its ETag/Last-Modified, or None when the server gives neither
+    (then there's no way to tell whether the source changed).
+    """
+    try:
+        response = await client.head(url)
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"HEAD {url} failed: {str(e)}")
+        return None
+
+    validator = response.headers.get("etag") or response.headers.get("last-modified")
+    if not validator:
+        return None
+    return hashlib.sha256(f"{url}{validator}".encode()).hexdigest()
+
+async def get_loaded_source_hashes(conn) -> set:
+    await conn.execute(
+        "CREATE TABLE IF NOT EXISTS ai.knowledge_loads ("
+        "id SERIAL PRIMARY KEY, "
+        "source_hash TEXT UNIQUE NOT NULL, "
+        "loaded_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    )
+    return {row["source_hash"] for row in await conn.fetch("SELECT source_hash FROM ai.knowledge_loads")}
+
+# Parsed + embedded chunks of each knowledge source, kept on disk as cache/<sha256(url)>.json
+# = {"source_hash": ..., "chunks": [{id, name, meta_data, filters, content, content_id, embedding}]}.
+# When the source's ETag/Last-Modified hasn't changed, the chunks are copied straight back into
+# the vectors table instead of fetching, parsing and embedding the page again.
+KNOWLEDGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+CHUNK_COLUMNS = ["id", "name", "meta_data", "filters", "content", "content_id", "embedding"]
+
+def get_chunk_cache_path(url: str) -> str:
+    return os.path.join(KNOWLEDGE_CACHE_DIR, f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+def read_chunk_cache(url: str) -> Optional[Dict]:
+    try:
+        with open(get_chunk_cache_path(url)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable chunk cache for {url}: {str(e)}")
+        return None
+
+def write_chunk_cache(url: str, source_hash: str, chunks: List[Dict]) -> None:
+    os.makedirs(KNOWLEDGE_CACHE_DIR, exist_ok=True)
+    path = get_chunk_cache_path(url)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"source_hash": source_hash, "chunks": chunks}, f)
+    os.replace(f"{path}.tmp", path)  # never leave a half-written cache behind
+
+def get_content_hash(url: str) -> str:
+    """The content_hash agno stores a url source's rows under in the vectors table."""
+    return knowledge._build_content_hash(Content(url=url))
+
+async def dump_source_chunks(url: str, source_hash: Optional[str]) -> int:
+    """
+    Writes the chunks just stored for url to the chunk cache and returns how many there were.
+    Without a source_hash a later load couldn't tell whether the cache is current, so nothing is written.
+    """
+    pool = await get_pg_pool()
+    rows = await pool.fetch(
+        "SELECT id, name, meta_data, filters, content, content_id, embedding::text AS embedding "
+        f"FROM {vector_db.table.fullname} WHERE content_hash = $1",
+        get_content_hash(url),
+    )
+    chunks = [
+        {
+            **dict(row),
+            "meta_data": json.loads(row["meta_data"]) if row["meta_data"] else None,
+            "filters": json.loads(row["filters"]) if row["filters"] else None,
+            "embedding": json.loads(row["embedding"]) if row["embedding"] else None,  # NULL if it failed to embed
+        }
+        for row in rows
+    ]
+    if chunks and source_hash:
+        # The chunks are already stored, a cache that can't be written only costs the next load
+        try:
+            await asyncio.to_thread(write_chunk_cache, url, source_hash, chunks)
+        except Exception as e:
+            logger.warning(f"Could not write the chunk cache for {url}: {str(e)}")
+    return len(chunks)
+
+async def restore_source_chunks(source: Dict, chunks: List[Dict]) -> None:
+    """Bulk-copies cached chunks (with their embeddings) into the vectors table."""
+    content_hash = get_content_hash(source["url"])
+    pool = await get_pg_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(f"DELETE FROM {vector_db.table.fullname} WHERE content_hash = $1", content_hash)
+            await conn.copy_records_to_table(
+                vector_db.table_name,
+                schema_name=vector_db.schema,
+                columns=[*CHUNK_COLUMNS, "content_hash"],
+                records=[
+                    (
+                        chunk["id"],
+                        chunk["name"],
+                        json.dumps(chunk["meta_data"] or {}),
+                        json.dumps(chunk["filters"] or {}),
+                        chunk["content"],
+                        chunk["content_id"],
+                        chunk["embedding"],
+                        content_hash,
+                    )
+                    for chunk in chunks
+                ],
+            )
+
+    # Register the source in the contents db too, as add_content_async would have
+    now = int(time.time())
+    await asyncio.to_thread(
+        knowledge.contents_db.upsert_knowledge_content,
+        KnowledgeRow(
+            id=chunks[0]["content_id"],
+            name=source["name"],
+            description="",
+            metadata=source["metadata"],
+            linked_to=knowledge.name,
+            access_count=0,
+            status=ContentStatus.COMPLETED,
+            status_message="",
+            created_at=now,
+            updated_at=now,
+        ),
+    )
+
+def clear_knowledge() -> None:
+    """Removes every source from the contents db and every chunk from the vectors table."""
+    knowledge.remove_all_content()
+    vector_db.delete()
+
+async def load_knowledge_source(source: Dict, source_hash: Optional[str]) -> None:
+    """Loads one source into the knowledge base, from the chunk cache when it is still current."""
+    cached = await asyncio.to_thread(read_chunk_cache, source["url"]) if source_hash else None
+    if cached and cached["source_hash"] == source_hash and cached["chunks"]:
+        await restore_source_chunks(source, cached["chunks"])
+        logger.info(f"Restored {len(cached['chunks'])} cached chunks for '{source['label']}'")
+        return
+
+    await knowledge.add_content_async(
+        name=source["name"],
+        url=source["url"],
+        metadata=source["metadata"],
+    )
+    # add_content_async logs and swallows read errors, so check that something was stored
+    if not await dump_source_chunks(source["url"], source_hash):
+        raise ValueError(f"no chunks were stored for {source['url']}")
+
+@app.post("/loadknowledge")
+async def load_knowledge(force: bool = False):
+    """
+    Endpoint to (re)load swim performance data.
+    Loads (concurrently, a failed source doesn't abort the other):
+      1. USA Swimming Motivational Standards -> ai.usa_swimming_standards
+      2. College recruiting times -> knowledge base
+    Skipped when every source's ETag/Last-Modified matches the last successful load,
+    unless ?force=true.
+    """
+    async with knowledge_load_lock, advisory_lock(KNOWLEDGE_LOAD_LOCK_ID):
+        return await _load_knowledge(force)
+
+async def _load_knowledge(force: bool):
+    try:
+        labels = ["USA Swimming Standards 2024-2028"] + [source["label"] for source in KNOWLEDGE_SOURCES]
+        urls = [USA_STANDARDS_URL] + [source["url"] for source in KNOWLEDGE_SOURCES]
+
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            source_hashes = await asyncio.gather(*(get_source_hash(client, url) for url in urls))
+
+        pool = await get_pg_pool()
+        async with pool.acquire() as conn:
+            loaded_hashes = await get_loaded_source_hashes(conn)
+
+        if not force and all(source_hash in loaded_hashes for source_hash in source_hashes):
+            logger.info("SwimBench knowledge sources unchanged, skipping load")
+            return {
+                "status": "unchanged",
+                "message": "SwimBench knowledge sources haven't changed since the last load (use ?force=true to reload)",
+                "loaded_documents": [],
+                "failed_documents": [],
             }
+
+        logger.info("Starting SwimBench knowledge loading...")
+        await asyncio.to_thread(clear_knowledge)
+
+        # Each source is fetched, chunked and embedded independently - run them side by side
+        results = await asyncio.gather(
+            load_usa_swimming_standards(),
+            *(
+                load_knowledge_source(source, source_hash)
+                for source, source_hash in zip(KNOWLEDGE_SOURCES, source_hashes[1:])
+            ),
+            return_exceptions=True,
         )
-        
+
+        loaded_documents = []
+        failed_documents = []
+        for label, result in zip(labels, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error loading '{label}': {str(result)}")
+                failed_documents.append(label)
+            else:
+                loaded_documents.append(label)
+
+        if not loaded_documents:
+            raise RuntimeError(f"all sources failed to load: {', '.join(failed_documents)}")
+
+        # Remember what was loaded so an identical request can be skipped next time.
+        # The knowledge base was cleared, so hashes from earlier loads no longer apply.
+        loaded_source_hashes = [
+            (source_hash,)
+            for source_hash, result in zip(source_hashes, results)
+            if source_hash is not None and not isinstance(result, Exception)
+        ]
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM ai.knowledge_loads")
+                await conn.executemany(
+                    "INSERT INTO ai.knowledge_loads (source_hash) VALUES ($1)", loaded_source_hashes
+                )
+        # New load version: this worker re-reads it now, the others within version_ttl
+        swimbench_tools.clear_cache()
+
+        # Row count changed, re-size the HNSW index if it crossed a tier
+        await asyncio.to_thread(tune_vector_index)
+
+        # Fresh standards invalidate the cached answers, seeded and stored alike
+        if not isinstance(results[0], Exception):
+            try:
+                await asyncio.to_thread(clear_stored_responses)
+                await seed_standard_queries()
+            except Exception as e:
+                logger.error(f"Error seeding semantic cache: {str(e)}")
+
         logger.info("SwimBench knowledge loading completed successfully")
         
         return {
-            "status": "success", 
-            "message": "SwimBench knowledge base loaded successfully",
-            "loaded_documents": [
-                "USA Swimming Standards 2024-2028",
-                "College Recruiting Standards"
-            ]
+            "status": "success" if not failed_documents else "partial", 
+            "message": "SwimBench knowledge base loaded successfully" if not failed_documents
+                else "SwimBench knowledge base loaded with errors",
+            "loaded_documents": loaded_documents,
+            "failed_documents": failed_documents,
         }
         
     except Exception as e:
@@ -275,12 +1676,18 @@ async def load_knowledge():
 if __name__ == "__main__":
     import uvicorn
     
-    port = int(os.getenv("PORT", 8000))
-    use_reload = ENV == "development"
+    use_reload = settings.env == "development"
+    # In production use the usual 2*cpu+1 workers. They import main afresh and size their
+    # pools from WEB_CONCURRENCY (see Settings.workers)
+    workers = 1 if use_reload else settings.web_concurrency or 2 * (os.cpu_count() or 1) + 1
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     
     uvicorn.run(
         "main:app",
         host="0.0.0.0", 
-        port=port,
-        reload=use_reload
+        port=settings.port,
+        reload=use_reload,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop", # uvloop has no Windows build
+        http="httptools",
     )
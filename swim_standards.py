@@ -0,0 +1,78 @@
+"""
+Parsing for the USA Swimming motivational time standards PDF.
+
+Kept apart from main.py (which connects to the database at import time) so the parser
+can be tested against page text on its own.
+"""
+import functools
+import io
+import re
+from typing import List, Optional, Tuple
+
+from pypdf import PdfReader
+
+# Each PDF row reads: girls B..AAAA | event | boys AAAA..B (the fastest cuts meet in the middle)
+GIRLS_LEVELS = ["B", "BB", "A", "AA", "AAA", "AAAA"]
+BOYS_LEVELS = list(reversed(GIRLS_LEVELS))
+STROKES = {"FR": "freestyle", "BK": "backstroke", "BR": "breaststroke", "FL": "butterfly", "IM": "im"}
+AGE_GROUPS = ["10-under", "11-12", "13-14", "15-16", "17-18"]
+
+TIME_PATTERN = r"(?:\d{1,2}:)?\d{1,2}\.\d{2}"
+# Matched against the page text with all whitespace collapsed, so a row whose cells pypdf
+# split over several lines still matches.
+AGE_GROUP_HEADING = r"(?P<age_group>10\s*(?:&|and)\s*under|11-12|13-14|15-16|17-18)"
+STANDARD_ROW = (
+    rf"(?P<girls>(?:{TIME_PATTERN} ){{6}})"
+    r"(?P<distance>\d+) (?P<stroke>FR|BK|BR|FL|IM) (?P<course>SCY|SCM|LCM) "
+    rf"(?P<boys>(?:{TIME_PATTERN}(?: |$)){{6}})"
+)
+PAGE_TOKEN = re.compile(rf"(?<![\d:.]){STANDARD_ROW}|\b{AGE_GROUP_HEADING}\b", re.IGNORECASE)
+
+StandardRow = Tuple[str, str, str, str, str, float]
+
+@functools.lru_cache(maxsize=4096)
+def time_to_seconds(value: str) -> float:
+    """Converts MM:SS.SS or SS.SS to seconds."""
+    minutes, _, seconds = value.strip().rpartition(":")
+    return round(int(minutes or 0) * 60 + float(seconds), 2)
+
+def seconds_to_time(seconds: float) -> str:
+    """Formats seconds as M:SS.SS (or SS.SS under a minute)."""
+    minutes, seconds = divmod(round(seconds, 2), 60)
+    return f"{int(minutes)}:{seconds:05.2f}" if minutes else f"{seconds:.2f}"
+
+def parse_standards_page(
+    page_text: str, age_group: Optional[str] = None
+) -> Tuple[List[StandardRow], Optional[str]]:
+    """
+    Extracts (event, age_group, gender, course, standard_level, cutoff_time) rows from one page.
+    Rows belong to the last age group heading seen (carried over from the previous page via
+    age_group). Rows that don't have all 12 cuts are skipped. Returns (rows, last age group).
+    """
+    rows = []
+    for match in PAGE_TOKEN.finditer(" ".join(page_text.split())):
+        if match["age_group"]:
+            heading = match["age_group"].lower()
+            age_group = "10-under" if heading.startswith("10") else heading
+            continue
+        if age_group is None:
+            continue
+
+        event = f"{match['distance']}_{STROKES[match['stroke'].upper()]}"
+        course = match["course"].upper()
+        for gender, levels, times in (
+            ("F", GIRLS_LEVELS, match["girls"].split()),
+            ("M", BOYS_LEVELS, match["boys"].split()),
+        ):
+            for level, cutoff in zip(levels, times):
+                rows.append((event, age_group, gender, course, level, time_to_seconds(cutoff)))
+    return rows, age_group
+
+def parse_usa_standards(pdf: bytes) -> List[StandardRow]:
+    """Extracts the standards rows from every page of the motivational standards PDF."""
+    rows: List[StandardRow] = []
+    age_group = None
+    for page in PdfReader(io.BytesIO(pdf)).pages:
+        page_rows, age_group = parse_standards_page(page.extract_text() or "", age_group)
+        rows.extend(page_rows)
+    return rows
@@ -0,0 +1,96 @@
+"""
+Round-trips a knowledge source through the chunk cache: restore_source_chunks() copies cached
+chunks into the vectors table, dump_source_chunks() reads them back out into the cache.
+main.py connects to the database at import time, so this needs DATABASE_CONNECTION_STRING
+(and OPENAI_API_KEY, which is never called) to point at a Postgres with pgvector.
+"""
+import asyncio
+import os
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("DATABASE_CONNECTION_STRING"), reason="needs a Postgres database with pgvector"
+)
+
+SOURCE = {
+    "label": "Chunk Cache Test",
+    "name": "Chunk Cache Test",
+    "url": "https://example.com/swimbench-chunk-cache-test",
+    "metadata": {"user_tag": "Test", "content_type": "test", "source": "tests"},
+}
+
+def make_chunks(main):
+    content_id = "00000000-0000-4000-8000-000000000001"
+    # Values that are exact in FP16, so they survive the halfvec column unchanged
+    return [
+        {
+            "id": f"chunk-cache-test-{i}",
+            "name": SOURCE["name"],
+            "meta_data": {"chunk": i, **SOURCE["metadata"]},
+            "filters": None,
+            "content": f"chunk {i} content",
+            "content_id": content_id,
+            "embedding": [0.5 if j == i else 0.0 for j in range(main.vector_db.dimensions)],
+        }
+        for i in range(3)
+    ] + [
+        {
+            "id": "chunk-cache-test-unembedded",
+            "name": SOURCE["name"],
+            "meta_data": None,
+            "filters": None,
+            "content": "chunk that failed to embed",
+            "content_id": content_id,
+            "embedding": None,
+        }
+    ]
+
+def test_dump_and_restore_round_trip(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "KNOWLEDGE_CACHE_DIR", str(tmp_path))
+    main.vector_db.create()
+    chunks = make_chunks(main)
+
+    async def round_trip():
+        try:
+            await main.restore_source_chunks(SOURCE, chunks)
+            count = await main.dump_source_chunks(SOURCE["url"], "source-hash")
+            # Restoring twice replaces the rows instead of duplicating them
+            await main.restore_source_chunks(SOURCE, main.read_chunk_cache(SOURCE["url"])["chunks"])
+            pool = await main.get_pg_pool()
+            rows = await pool.fetchval(
+                f"SELECT count(*) FROM {main.vector_db.table.fullname} WHERE content_hash = $1",
+                main.get_content_hash(SOURCE["url"]),
+            )
+            return count, rows
+        finally:
+            pool = await main.get_pg_pool()
+            await pool.execute(
+                f"DELETE FROM {main.vector_db.table.fullname} WHERE content_hash = $1",
+                main.get_content_hash(SOURCE["url"]),
+            )
+            await pool.close()
+            main.pg_pool = None
+
+    try:
+        count, rows = asyncio.run(round_trip())
+        cached = main.read_chunk_cache(SOURCE["url"])
+        content = main.knowledge.contents_db.get_knowledge_content(chunks[0]["content_id"])
+    finally:
+        main.knowledge.contents_db.delete_knowledge_content(chunks[0]["content_id"])
+
+    assert count == rows == len(chunks)
+    assert cached["source_hash"] == "source-hash"
+    by_id = {chunk["id"]: chunk for chunk in cached["chunks"]}
+    for chunk in chunks:
+        restored = by_id[chunk["id"]]
+        assert restored["content"] == chunk["content"]
+        assert restored["content_id"] == chunk["content_id"]
+        assert restored["meta_data"] == (chunk["meta_data"] or {})
+        assert restored["embedding"] == chunk["embedding"]
+
+    assert content is not None
+    assert content.name == SOURCE["name"]
+    assert content.status == main.ContentStatus.COMPLETED
@@ -0,0 +1,59 @@
+"""
+Page text below is in the shape pypdf extracts from the 2024-2028 motivational standards PDF:
+an age group heading, then one row per event with the girls' cuts (B..AAAA), the event and
+the boys' cuts (AAAA..B).
+"""
+from swim_standards import parse_standards_page, seconds_to_time, time_to_seconds
+
+HEADER = "2024-2028 AGE GROUP MOTIVATIONAL STANDARDS\n{age} Girls Events Boys\nB BB A AA AAA AAAA AAAA AAA AA A BB B\n"
+FREE_50 = "40.19 36.49 34.69 32.89 31.09 29.29 50 FR SCY 28.89 30.59 32.29 33.99 35.79 39.39"
+FREE_100 = "1:28.09 1:20.29 1:16.39 1:12.49 1:08.59 1:04.69 100 FR SCY 1:03.79 1:07.59 1:11.39 1:15.19 1:18.99 1:26.59"
+
+def test_parses_a_row_per_line():
+    rows, age_group = parse_standards_page(HEADER.format(age="10 & under") + FREE_50 + "\n" + FREE_100 + "\n")
+
+    assert age_group == "10-under"
+    assert len(rows) == 24
+    assert rows[0] == ("50_freestyle", "10-under", "F", "SCY", "B", 40.19)
+    assert rows[5] == ("50_freestyle", "10-under", "F", "SCY", "AAAA", 29.29)
+    assert rows[6] == ("50_freestyle", "10-under", "M", "SCY", "AAAA", 28.89)
+    assert rows[11] == ("50_freestyle", "10-under", "M", "SCY", "B", 39.39)
+    assert rows[12] == ("100_freestyle", "10-under", "F", "SCY", "B", 88.09)
+
+def test_row_split_over_lines():
+    split = "40.19 36.49 34.69\n32.89 31.09 29.29 50\nFR SCY 28.89 30.59\n32.29 33.99 35.79 39.39\n"
+    rows, _ = parse_standards_page(HEADER.format(age="13-14") + split)
+
+    assert rows == parse_standards_page(HEADER.format(age="13-14") + FREE_50)[0]
+    assert len(rows) == 12
+
+def test_age_group_heading_variants_and_continuation_pages():
+    rows, age_group = parse_standards_page(HEADER.format(age="10 & Under") + FREE_50)
+    assert {row[1] for row in rows} == {"10-under"}
+
+    # A page without a heading continues the previous page's age group
+    rows, age_group = parse_standards_page(FREE_100, age_group)
+    assert {row[1] for row in rows} == {"10-under"}
+
+    # Rows before any heading can't be attributed and are skipped
+    assert parse_standards_page(FREE_100) == ([], None)
+
+def test_two_age_groups_on_one_page():
+    page = HEADER.format(age="15-16") + FREE_50 + "\n" + HEADER.format(age="17-18") + FREE_100
+    rows, age_group = parse_standards_page(page)
+
+    assert age_group == "17-18"
+    assert {(row[0], row[1]) for row in rows} == {("50_freestyle", "15-16"), ("100_freestyle", "17-18")}
+
+def test_incomplete_rows_are_skipped():
+    incomplete = "40.19 36.49 34.69 32.89 31.09 50 FR SCY 28.89 30.59 32.29 33.99 35.79 39.39"
+    rows, _ = parse_standards_page(HEADER.format(age="11-12") + incomplete + "\n" + FREE_100)
+
+    assert {row[0] for row in rows} == {"100_freestyle"}
+
+def test_time_conversions():
+    assert time_to_seconds("1:04.69") == 64.69
+    assert time_to_seconds("29.29") == 29.29
+    assert seconds_to_time(64.69) == "1:04.69"
+    assert seconds_to_time(29.29) == "29.29"
+    assert seconds_to_time(600.05) == "10:00.05"